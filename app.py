@@ -1,8 +1,8 @@
 import streamlit as st
 from rag import RAGSystem
-from config import BOOKS_MAP, PERSIST_DIRECTORY, BOOKS_DIR
+from config import BOOKS_MAP, PERSIST_DIRECTORY, BOOKS_DIR, MODEL_NAME
 from generate_embeddings import DocumentProcessor
-import os
+from vectorstore import index_is_ready
 from pathlib import Path
 
 def check_pdf_files() -> bool:
@@ -36,7 +36,8 @@ def create_embeddings_if_needed() -> None:
     """Crée les embeddings des documents si nécessaire.
     
     Cette fonction vérifie d'abord l'existence des fichiers source,
-    puis crée les embeddings si le dossier de persistance est vide.
+    puis crée les embeddings si aucun index complet n'existe pour la configuration courante
+    (modèle, précision des vecteurs et moteur d'inférence).
     
     Raises:
         Exception: Si la création des embeddings échoue.
@@ -44,18 +45,40 @@ def create_embeddings_if_needed() -> None:
     if not check_pdf_files():
         st.stop()
         
-    if not os.path.exists(PERSIST_DIRECTORY) or not os.listdir(PERSIST_DIRECTORY):
+    if not index_is_ready(PERSIST_DIRECTORY, MODEL_NAME):
         with st.spinner('Première utilisation : création de l\'index des documents...'):
             try:
-                processor = DocumentProcessor()
-                raw_docs = processor.load_documents(list(BOOKS_MAP.values()))
-                processed_docs = processor.process_documents(raw_docs)
+                processor = get_document_processor()
+                processed_docs = processor.load_and_process_documents(list(BOOKS_MAP.values()))
                 processor.create_vectorstore(processed_docs, PERSIST_DIRECTORY)
-                st.success('Index créé avec succès!')
             except Exception as e:
                 st.error(f"Erreur lors de la création de l'index: {str(e)}")
                 raise e
 
+@st.cache_resource(show_spinner=False)
+def get_document_processor() -> DocumentProcessor:
+    """Retourne le processeur de documents partagé par toutes les sessions.
+
+    Returns:
+        DocumentProcessor: Instance unique du processeur (modèle chargé une seule fois).
+    """
+    return DocumentProcessor()
+
+@st.cache_resource(show_spinner=False)
+def get_rag() -> RAGSystem:
+    """Retourne le système RAG partagé par toutes les sessions.
+
+    La vérification des fichiers et la création éventuelle de l'index
+    ne sont faites qu'une fois par processus. En cas d'échec, rien n'est
+    mis en cache et la vérification est refaite à l'exécution suivante.
+
+    Returns:
+        RAGSystem: Instance unique du système RAG.
+    """
+    create_embeddings_if_needed()
+    with st.spinner('Initialisation du système RAG...'):
+        return RAGSystem()
+
 def initialize_rag() -> RAGSystem:
     """Initialise le système RAG avec création des embeddings si nécessaire.
     
@@ -63,13 +86,9 @@ def initialize_rag() -> RAGSystem:
         RAGSystem: Instance initialisée du système RAG.
         
     Note:
-        Utilise st.session_state pour éviter les réinitialisations inutiles.
+        Utilise st.cache_resource pour partager le modèle entre toutes les sessions.
     """
-    if 'rag_system' not in st.session_state:
-        create_embeddings_if_needed()
-        with st.spinner('Initialisation du système RAG...'):
-            st.session_state.rag_system = RAGSystem()
-    return st.session_state.rag_system
+    return get_rag()
 
 def main():
     st.title("🤖 Assistant IA - Base de Connaissances")
@@ -97,26 +116,30 @@ def main():
         st.error("Erreur d'initialisation du système")
         st.stop()
 
+    # Statistiques du cache de recherche (remplies en fin de page, après la requête)
+    cache_stats = st.sidebar.empty()
+
     # Query input
     user_query = st.text_area("Votre question:", height=100)
     
     if st.button("Envoyer"):
-        if user_query:
-            if not selected_books:
-                st.warning("Veuillez sélectionner au moins une source.")
-                return
-                
-            with st.spinner('Recherche en cours...'):
-                try:
+        # Plusieurs questions séparées par une ligne vide sont recherchées en un seul lot
+        questions = [q.strip() for q in user_query.split("\n\n") if q.strip()]
+        if questions and not selected_books:
+            st.warning("Veuillez sélectionner au moins une source.")
+        elif questions:
+            try:
+                with st.spinner('Recherche en cours...'):
                     # Passer les sources sélectionnées à la requête
-                    context, sources = rag.get_relevant_context(user_query, selected_sources=selected_sources)
-                    prompt = rag.generate_prompt(user_query, context, sources)
-                    answer = rag.generate_answer(prompt)
-                    
-                    st.markdown("### Réponse:")
-                    st.write(answer)
-                except Exception as e:
-                    st.error(f"Une erreur s'est produite: {str(e)}")
+                    contexts = rag.get_relevant_contexts(questions, selected_sources=selected_sources)
+                
+                for question, (context, sources) in zip(questions, contexts):
+                    prompt = rag.generate_prompt(question, context, sources)
+                    # Afficher la réponse au fur et à mesure de sa génération
+                    st.markdown("### Réponse:" if len(questions) == 1 else f"### {question}")
+                    st.write_stream(rag.generate_answer_stream(prompt))
+            except Exception as e:
+                st.error(f"Une erreur s'est produite: {str(e)}")
         else:
             st.warning("Veuillez entrer une question.")
 
@@ -129,5 +152,11 @@ def main():
         - Explique-moi ce que sont les Hunger Games.
         """)
 
+    cache = rag.query_cache
+    cache_stats.caption(
+        f"Cache : {cache.hits} succès / {cache.misses} échecs "
+        f"(taux {cache.hit_rate:.0%})"
+    )
+
 if __name__ == "__main__":
     main()
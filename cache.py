@@ -0,0 +1,71 @@
+"""
+Module de cache des résultats de recherche.
+Évite de ré-encoder et de re-chercher les questions déjà posées.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class QueryCache:
+    """
+    Cache LRU avec durée de vie, partageable entre threads.
+
+    Attributs:
+        max_size: Nombre maximal d'entrées conservées
+        ttl_seconds: Durée de vie d'une entrée (secondes)
+        hits: Nombre de requêtes servies depuis le cache
+        misses: Nombre de requêtes absentes ou expirées
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retourne la valeur associée à la clé si elle est présente et non expirée.
+
+        Args:
+            key: Clé de la requête
+
+        Returns:
+            Valeur en cache ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Enregistre une valeur en évinçant l'entrée la moins récemment utilisée si besoin."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Proportion de requêtes servies depuis le cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
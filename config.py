@@ -7,6 +7,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 import streamlit as st
+import torch
 
 # Charger les variables d'environnement (pour développement local)
 load_dotenv()
@@ -16,15 +17,61 @@ BASE_DIR = Path(__file__).parent
 BOOKS_DIR = BASE_DIR / "livres"  # Dossier contenant les livres PDF
 
 # Configuration du modèle d'embeddings
-MODEL_NAME = "intfloat/multilingual-e5-large-instruct"  # Modèle multilingue pour les embeddings
-DEVICE = "cuda:2"  # Périphérique de calcul (GPU ou CPU)
+# Profils disponibles : modèle Hugging Face et dimension des vecteurs
+EMBEDDING_PROFILES = {
+    "small": {"model_name": "intfloat/multilingual-e5-small", "dimension": 384},
+    "base": {"model_name": "intfloat/multilingual-e5-base", "dimension": 768},
+    "large": {"model_name": "intfloat/multilingual-e5-large", "dimension": 1024},
+}
+EMBEDDING_PROFILE = "small"  # Profil actif
+MODEL_NAME = EMBEDDING_PROFILES[EMBEDDING_PROFILE]["model_name"]  # Modèle multilingue pour les embeddings
+EMBEDDING_BACKEND = "onnx"  # Moteur d'inférence de l'encodeur (onnx ou ctranslate2)
+ONNX_FILE_NAME = "onnx/model_qint8_avx512_vnni.onnx"  # Version quantifiée INT8 (AVX-512 VNNI)
+
+def _detect_device() -> str:
+    """
+    Choisit le périphérique de calcul : RAG_DEVICE, sinon le GPU le moins chargé, sinon le CPU.
+
+    La mémoire libre est lue via NVML, ce qui évite de créer un contexte CUDA
+    sur chaque GPU au chargement de la configuration.
+    """
+    device = os.getenv("RAG_DEVICE")
+    if device:
+        return device
+    # Aligner la numérotation CUDA sur celle de NVML (ordre des bus PCI)
+    os.environ.setdefault("CUDA_DEVICE_ORDER", "PCI_BUS_ID")
+    if not torch.cuda.is_available():
+        return "cpu"
+    visible = os.getenv("CUDA_VISIBLE_DEVICES")
+    if os.environ["CUDA_DEVICE_ORDER"] != "PCI_BUS_ID" or (
+            visible is not None and not all(d.strip().isdigit() for d in visible.split(","))):
+        return "cuda:0"
+    try:
+        import pynvml
+        pynvml.nvmlInit()
+        try:
+            nvml_indices = ([int(d) for d in visible.split(",")] if visible is not None
+                            else range(pynvml.nvmlDeviceGetCount()))
+            free_memory = [
+                pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(i)).free
+                for i in nvml_indices
+            ]
+        finally:
+            pynvml.nvmlShutdown()
+    except Exception:
+        return "cuda:0"
+    return f"cuda:{free_memory.index(max(free_memory))}"
+
+DEVICE = _detect_device()  # Périphérique de calcul (GPU ou CPU)
 
 # Configuration du stockage des vecteurs
-PERSIST_DIRECTORY = "books_index"  # Dossier de persistance des embeddings
+PERSIST_DIRECTORY = f"books_index_e5{EMBEDDING_PROFILE}"  # Dossier de persistance (un par profil)
+VECTOR_PRECISION = "fp16"  # Précision des vecteurs stockés (fp32, fp16 ou int8)
 
 # Paramètres de traitement des documents
-CHUNK_SIZE = 600     # Taille des segments de texte (caractères)
-CHUNK_OVERLAP = 100  # Chevauchement entre segments (caractères)
+CHUNK_CACHE_DIR = BASE_DIR / ".chunk_cache"  # Cache des segments déjà découpés
+CHUNK_SIZE = 450    # Taille des segments de texte (jetons, sous la limite de 512 du modèle)
+CHUNK_OVERLAP = 60  # Chevauchement entre segments (jetons)
 
 # Documentation des livres sources
 BOOKS_MAP = {
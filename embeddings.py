@@ -0,0 +1,200 @@
+"""
+Module d'encodage des textes en vecteurs.
+Fournit des encodeurs E5 quantifiés INT8 exécutés avec ONNX Runtime ou CTranslate2.
+"""
+
+import functools
+import logging
+from typing import List
+import numpy as np
+import torch
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer
+from config import MODEL_NAME, ONNX_FILE_NAME, DEVICE, EMBEDDING_BACKEND
+
+BATCH_SIZE = 256  # Nombre de textes encodés par passe
+
+logger = logging.getLogger(__name__)
+
+def average_pool(last_hidden_states: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """
+    Moyenne des états cachés en ignorant les jetons de remplissage.
+
+    Args:
+        last_hidden_states: Sortie du dernier niveau de l'encodeur
+        attention_mask: Masque d'attention du tokenizer
+
+    Returns:
+        Un vecteur par texte
+    """
+    last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
+    return last_hidden.sum(dim=1) / attention_mask.sum(dim=1)[..., None]
+
+class OnnxE5Embeddings(Embeddings):
+    """
+    Encodeur multilingual-e5 compatible LangChain.
+
+    Charge la version INT8 (instructions AVX-512 VNNI) du modèle via ONNX Runtime,
+    ce qui évite toute dépendance à un GPU.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, file_name: str = ONNX_FILE_NAME, device: str = DEVICE,
+                 batch_size: int = BATCH_SIZE):
+        """
+        Initialise le tokenizer et la session ONNX Runtime.
+
+        Args:
+            model_name: Nom du modèle sur le Hub Hugging Face
+            file_name: Chemin du fichier ONNX dans le dépôt du modèle
+            device: Périphérique de calcul (CPU/GPU)
+            batch_size: Nombre de textes encodés par passe
+        """
+        # Import local : seul le moteur configuré doit être installé
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+        self.batch_size = batch_size
+        provider, provider_options = "CPUExecutionProvider", None
+        if device.startswith("cuda") and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+            provider = "CUDAExecutionProvider"
+            provider_options = {"device_id": int(device.partition(":")[2] or 0)}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_name,
+            file_name=file_name,
+            provider=provider,
+            provider_options=provider_options
+        )
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode un lot de textes puis normalise les vecteurs (norme L2)."""
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+        # Avec le fournisseur CUDA, entrées et sorties sont sur le GPU
+        inputs = inputs.to(self.model.device)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        embeddings = average_pool(outputs.last_hidden_state, inputs["attention_mask"])
+        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+        return embeddings.cpu().numpy().astype(np.float32, copy=False)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode les textes par lots de longueur similaire.
+
+        Les textes sont triés par longueur afin de limiter le remplissage
+        de chaque lot, puis les vecteurs sont remis dans l'ordre d'origine.
+        """
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        embeddings = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._encode_batch([texts[i] for i in batch])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch] = vectors
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Encode des segments de documents (préfixe E5 « passage: ») en un tableau float32."""
+        return self._encode([f"passage: {text}" for text in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode des segments de documents (préfixe E5 « passage: »)."""
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Encode une question (préfixe E5 « query: »)."""
+        return self._encode_batch([f"query: {text}"])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode plusieurs questions (préfixe E5 « query: ») en un tableau float32."""
+        return self._encode([f"query: {text}" for text in texts])
+
+class CT2E5Embeddings(Embeddings):
+    """
+    Encodeur multilingual-e5 compatible LangChain exécuté avec CTranslate2.
+
+    Le modèle est converti et quantifié au premier chargement :
+    int8_float16 sur GPU, int8 sur CPU.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, device: str = DEVICE, batch_size: int = 64):
+        """
+        Initialise le modèle CTranslate2.
+
+        Args:
+            model_name: Nom du modèle sur le Hub Hugging Face
+            device: Périphérique de calcul (CPU/GPU)
+            batch_size: Nombre de textes encodés par passe
+        """
+        # Import local : seul le moteur configuré doit être installé
+        from hf_hub_ctranslate2 import CT2SentenceTransformer
+
+        self.batch_size = batch_size
+        on_gpu = device.startswith("cuda")
+        self.model = CT2SentenceTransformer(
+            model_name,
+            # Périphérique complet (ex. "cuda:2") : CTranslate2 suit celui des entrées
+            device=device if on_gpu else "cpu",
+            compute_type="int8_float16" if on_gpu else "int8"
+        )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode les textes en vecteurs normalisés (norme L2)."""
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Encode des segments de documents (préfixe E5 « passage: ») en un tableau float32."""
+        return self._encode([f"passage: {text}" for text in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode des segments de documents (préfixe E5 « passage: »)."""
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Encode une question (préfixe E5 « query: »)."""
+        return self._encode([f"query: {text}"])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode plusieurs questions (préfixe E5 « query: ») en un tableau float32."""
+        return self._encode([f"query: {text}" for text in texts])
+
+def create_embeddings(model_name: str = MODEL_NAME, device: str = DEVICE,
+                      backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """
+    Crée l'encodeur correspondant au moteur d'inférence configuré.
+
+    Args:
+        model_name: Nom du modèle sur le Hub Hugging Face
+        device: Périphérique de calcul (CPU/GPU)
+        backend: Moteur d'inférence ("onnx" ou "ctranslate2")
+
+    Returns:
+        Encodeur compatible LangChain
+
+    Raises:
+        ValueError: Si le moteur n'est pas reconnu
+    """
+    logger.info(f"Loading {backend} encoder {model_name} on device: {device}")
+    if backend == "onnx":
+        return OnnxE5Embeddings(model_name=model_name, device=device)
+    if backend == "ctranslate2":
+        return CT2E5Embeddings(model_name=model_name, device=device)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+@functools.lru_cache(maxsize=1)
+def get_embedder(model_name: str = MODEL_NAME, device: str = DEVICE,
+                 backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """
+    Retourne l'encodeur partagé du processus.
+
+    Le modèle n'est chargé qu'une fois, même lorsque l'index est construit
+    puis interrogé dans la même exécution.
+    """
+    return create_embeddings(model_name=model_name, device=device, backend=backend)
@@ -3,20 +3,31 @@ Module de traitement des documents et création des embeddings.
 Gère le chargement, le découpage et l'indexation des documents PDF.
 """
 
+import hashlib
 import logging
+import os
+import pickle
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from typing import List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.docstore.document import Document
-from config import MODEL_NAME, DEVICE, PERSIST_DIRECTORY, PDF_PATHS, CHUNK_SIZE, CHUNK_OVERLAP
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer
+from embeddings import get_embedder
+from vectorstore import FaissVectorStore, clear_index_ready, mark_index_ready
+from config import MODEL_NAME, DEVICE, PERSIST_DIRECTORY, PDF_PATHS, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_CACHE_DIR, EMBEDDING_PROFILES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _load_pdf(path: str) -> List[Document]:
+    """Charge les pages d'un fichier PDF."""
+    return PyPDFLoader(path).load()
+
 class DocumentProcessor:
     """
     Handler de documents pour la création d'embeddings.
@@ -25,22 +36,23 @@ class DocumentProcessor:
     une base de données vectorielle pour la recherche sémantique.
     """
 
-    def __init__(self, model_name: str = MODEL_NAME, device: str = DEVICE):
+    def __init__(self, model_name: str = MODEL_NAME, device: str = DEVICE, embedder: Optional[Embeddings] = None):
         """
         Initialise le processeur avec un modèle d'embedding.
 
         Args:
             model_name: Nom du modèle d'embedding à utiliser
             device: Périphérique de calcul (CPU/GPU)
+            embedder: Encodeur à utiliser (par défaut l'encodeur partagé)
         """
-        self.embedding_function = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={"device": device}
-        )
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.model_name = model_name
+        self.embedding_function = embedder if embedder is not None else get_embedder(model_name, device)
+        # Longueur mesurée en jetons du modèle pour remplir sa fenêtre de 512 jetons
+        tokenizer = getattr(self.embedding_function, "tokenizer", None) or AutoTokenizer.from_pretrained(model_name)
+        self.text_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            tokenizer,
             chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len
+            chunk_overlap=CHUNK_OVERLAP
         )
 
     def load_documents(self, pdf_paths: List[str]) -> List[Document]:
@@ -57,19 +69,38 @@ class DocumentProcessor:
             Warning: Si un fichier n'est pas trouvé
             Error: Si le chargement échoue
         """
-        docs = []
+        docs, _ = self._load_documents(pdf_paths)
+        return docs
+
+    def _load_documents(self, pdf_paths: List[str]) -> Tuple[List[Document], List[str]]:
+        """Charge les documents PDF et retourne aussi les chemins dont le chargement a échoué."""
+        existing_paths = []
         for path in pdf_paths:
             if not Path(path).exists():
                 logger.warning(f"File not found: {path}")
                 continue
-            try:
-                loader = PyPDFLoader(path)
-                documents = loader.load()
-                docs.extend(documents)
-                logger.info(f"Successfully loaded: {path}")
-            except Exception as e:
-                logger.error(f"Error loading {path}: {str(e)}")
-        return docs
+            existing_paths.append(path)
+        if not existing_paths:
+            return [], []
+
+        # Chaque livre est indépendant : chargement en parallèle
+        loaded = {}
+        with ThreadPoolExecutor(max_workers=len(existing_paths)) as executor:
+            futures = {executor.submit(_load_pdf, path): path for path in existing_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    loaded[path] = future.result()
+                    logger.info(f"Successfully loaded: {path}")
+                except Exception as e:
+                    logger.error(f"Error loading {path}: {str(e)}")
+
+        # Conserver l'ordre des chemins fournis
+        docs = []
+        for path in existing_paths:
+            docs.extend(loaded.get(path, []))
+        failed_paths = [path for path in existing_paths if path not in loaded]
+        return docs, failed_paths
 
     def process_documents(self, docs: List[Document]) -> List[Document]:
         """
@@ -91,31 +122,104 @@ class DocumentProcessor:
         for doc in split_docs:
             if not hasattr(doc, 'metadata') or not doc.metadata:
                 doc.metadata = {'source': 'Unknown source', 'page': 'Unknown page'}
+            elif 'source' in doc.metadata:
+                # Nom de fichier seul, utilisé comme clé de filtrage par source
+                doc.metadata['source'] = os.path.basename(doc.metadata['source'])
         
         return split_docs
 
-    def create_vectorstore(self, docs: List[Document], persist_directory: str) -> Chroma:
+    def _chunk_cache_key(self, pdf_paths: List[str]) -> str:
+        """Clé du cache : fichiers (date de modification, taille) et paramètres de découpage."""
+        parts = [self.model_name, str(CHUNK_SIZE), str(CHUNK_OVERLAP)]
+        for path in pdf_paths:
+            if Path(path).exists():
+                stat = Path(path).stat()
+                parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+            else:
+                parts.append(f"{path}:missing")
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def load_and_process_documents(self, pdf_paths: List[str]) -> List[Document]:
+        """
+        Charge et découpe les documents PDF en réutilisant le cache disque si possible.
+
+        Le résultat est mis en cache dans CHUNK_CACHE_DIR ; toute modification
+        d'un fichier ou des paramètres de découpage change la clé du cache.
+        Rien n'est mis en cache si le chargement d'un fichier a échoué.
+
+        Args:
+            pdf_paths: Liste des chemins vers les fichiers PDF
+
+        Returns:
+            Liste des segments de documents avec métadonnées
+        """
+        cache_file = Path(CHUNK_CACHE_DIR) / f"{self._chunk_cache_key(pdf_paths)}.pkl"
+        if cache_file.exists():
+            try:
+                with open(cache_file, "rb") as f:
+                    split_docs = pickle.load(f)
+                logger.info(f"Loaded {len(split_docs)} chunks from cache: {cache_file}")
+                return split_docs
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable chunk cache {cache_file}: {str(e)}")
+
+        docs, failed_paths = self._load_documents(pdf_paths)
+        split_docs = self.process_documents(docs)
+        if failed_paths:
+            # Corpus incomplet : ne pas le figer dans le cache
+            logger.warning(f"Not caching chunks, failed to load: {', '.join(failed_paths)}")
+        elif split_docs:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            with open(tmp_file, "wb") as f:
+                pickle.dump(split_docs, f)
+            os.replace(tmp_file, cache_file)
+        return split_docs
+
+    def create_vectorstore(self, docs: List[Document], persist_directory: str) -> FaissVectorStore:
         """
         Crée et persiste la base de données vectorielle.
 
+        Une sentinelle est écrite une fois l'index complet sur disque.
+
         Args:
             docs: Liste des documents à indexer
             persist_directory: Répertoire de stockage
 
         Returns:
-            Instance de la base de données vectorielle Chroma
+            Instance de la base de données vectorielle FAISS
 
         Raises:
-            ValueError: Si aucun document n'est fourni
+            ValueError: Si aucun document n'est fourni ou si la dimension
+                des vecteurs ne correspond pas au profil du modèle
         """
         if not docs:
             raise ValueError("No documents provided for vectorstore creation")
         
-        vectorstore = Chroma.from_documents(
-            documents=docs,
-            embedding=self.embedding_function,
-            persist_directory=persist_directory
+        # Un index partiellement reconstruit ne doit pas être considéré comme prêt
+        clear_index_ready(persist_directory)
+
+        # Encoder tous les segments en une fois (par lots), directement en tableau
+        # numpy float32 lorsque l'encodeur le permet (évite la conversion en listes)
+        texts = [doc.page_content for doc in docs]
+        embed = getattr(self.embedding_function, "embed_documents_array", self.embedding_function.embed_documents)
+        embeddings = np.asarray(embed(texts), dtype=np.float32)
+
+        # Vérifier que l'encodeur produit la dimension déclarée pour ce modèle
+        expected_dimension = next(
+            (profile["dimension"] for profile in EMBEDDING_PROFILES.values()
+             if profile["model_name"] == self.model_name),
+            None
         )
+        if expected_dimension is not None and embeddings.shape[1] != expected_dimension:
+            raise ValueError(
+                f"Embedding dimension mismatch for {self.model_name}: "
+                f"expected {expected_dimension}, got {embeddings.shape[1]}"
+            )
+
+        vectorstore = FaissVectorStore.from_embeddings(embeddings, docs)
+        vectorstore.save(persist_directory)
+        mark_index_ready(persist_directory, self.model_name, len(docs))
         
         return vectorstore
 
@@ -125,14 +229,13 @@ def main():
         processor = DocumentProcessor()
 
         # Process documents
-        raw_docs = processor.load_documents(PDF_PATHS)
-        processed_docs = processor.process_documents(raw_docs)
+        processed_docs = processor.load_and_process_documents(PDF_PATHS)
         vectorstore = processor.create_vectorstore(processed_docs, PERSIST_DIRECTORY)
 
         # Log results
-        logger.info(f"Embeddings created and stored in Chroma vectorstore.")
+        logger.info(f"Embeddings created and stored in FAISS vectorstore.")
         logger.info(f"Number of documents: {len(processed_docs)}")
-        logger.info(f"Number of embeddings: {vectorstore._collection.count()}")
+        logger.info(f"Number of embeddings: {vectorstore.count()}")
 
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
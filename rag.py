@@ -6,14 +6,29 @@ Fournit les fonctionnalités de recherche et génération de réponses.
 import os
 import signal
 import sys
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 import google.generativeai as genai
-from dotenv import load_dotenv
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from embeddings import get_embedder
+from vectorstore import FaissVectorStore
+from cache import QueryCache
 from config import MODEL_NAME, DEVICE, PERSIST_DIRECTORY, GEMINI_API_KEY
 
+# Consignes fixes transmises une seule fois au modèle (system instruction)
+SYSTEM_INSTRUCTION = """\
+Vous êtes un assistant utile et informatif qui répond aux questions en utilisant le texte du contexte de référence fourni avec chaque question. \
+Assurez-vous de répondre par une phrase complète, en étant exhaustif et en incluant toutes les informations pertinentes. \
+Cependant, vous parlez à un public non technique, alors assurez-vous d'expliquer les concepts complexes de façon simple. \
+Si le contexte n'est pas pertinent pour la réponse, vous pouvez l'ignorer.
+
+TRÈS IMPORTANT: À la fin de votre réponse, citez les sources exactes que vous avez utilisées en indiquant \
+le nom du document et le numéro de page où l'information a été trouvée, en utilisant le format suivant:
+[Source: nom_du_document, Page: numéro_de_page]
+
+Les sources disponibles sont listées après le contexte (SOURCES)."""
+
 @dataclass
 class Source:
     """Représente une source documentaire avec son nom et numéro de page."""
@@ -27,10 +42,12 @@ class RAGSystem:
     Attributs:
         embedding_function: Fonction d'embedding pour la recherche sémantique
         vectorstore: Base de données vectorielle pour le stockage des documents
+        query_cache: Cache des contextes déjà calculés
         model: Modèle génératif pour la production des réponses
     """
     
-    def __init__(self, model_name: str = MODEL_NAME, persist_directory: str = PERSIST_DIRECTORY, device: str = DEVICE):
+    def __init__(self, model_name: str = MODEL_NAME, persist_directory: str = PERSIST_DIRECTORY, device: str = DEVICE,
+                 embedder: Optional[Embeddings] = None):
         """
         Initialise le système RAG.
         
@@ -38,31 +55,25 @@ class RAGSystem:
             model_name: Nom du modèle d'embedding à utiliser
             persist_directory: Répertoire de stockage des embeddings
             device: Périphérique de calcul (CPU/GPU)
+            embedder: Encodeur à utiliser (par défaut l'encodeur partagé)
         
         Raises:
             ValueError: Si la clé API Gemini n'est pas trouvée
         """
-        load_dotenv()  # Load environment variables
-        
         self.gemini_key = GEMINI_API_KEY
         if not self.gemini_key:
             raise ValueError("GEMINI_API_KEY not found in configuration")
             
         # Initialize embeddings
-        self.embedding_function = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={"device": device}
-        )
+        self.embedding_function = embedder if embedder is not None else get_embedder(model_name, device)
         
         # Initialize vector store
-        self.vectorstore = Chroma(
-            embedding_function=self.embedding_function,
-            persist_directory=persist_directory
-        )
+        self.vectorstore = FaissVectorStore.load(persist_directory)
+        self.query_cache = QueryCache()
         
         # Initialize Gemini
         genai.configure(api_key=self.gemini_key)
-        self.model = genai.GenerativeModel()
+        self.model = genai.GenerativeModel(system_instruction=SYSTEM_INSTRUCTION)
 
     def get_relevant_context(self, query: str, k: int = 20, selected_sources: List[str] = None) -> Tuple[str, List[Source]]:
         """
@@ -76,59 +87,103 @@ class RAGSystem:
         Returns:
             Tuple contenant le contexte et la liste des sources utilisées
         """
-        search_results = self.vectorstore.similarity_search(query, k=k)
-        
-        context = ""
+        return self.get_relevant_contexts([query], k=k, selected_sources=selected_sources)[0]
+
+    def get_relevant_contexts(self, queries: List[str], k: int = 20,
+                              selected_sources: List[str] = None) -> List[Tuple[str, List[Source]]]:
+        """
+        Récupère le contexte pertinent pour plusieurs requêtes à la fois.
+
+        Les requêtes absentes du cache sont encodées en un seul lot puis
+        recherchées ensemble dans la base vectorielle.
+
+        Args:
+            queries: Questions de l'utilisateur
+            k: Nombre de résultats à retourner par question
+            selected_sources: Liste des sources à utiliser (optionnel)
+
+        Returns:
+            Liste de tuples (contexte, sources utilisées), dans l'ordre des requêtes
+        """
+        source_key = tuple(selected_sources or ())
+        results = [self.query_cache.get((query, source_key, k)) for query in queries]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        # Le filtrage par source est fait par la base vectorielle (un index par livre)
+        source_filter = [os.path.basename(src) for src in selected_sources] if selected_sources else None
+        missing_queries = [queries[i] for i in missing]
+        if hasattr(self.embedding_function, "embed_queries"):
+            query_embeddings = self.embedding_function.embed_queries(missing_queries)
+        else:
+            query_embeddings = [self.embedding_function.embed_query(query) for query in missing_queries]
+        search_results = self.vectorstore.similarity_search_by_vectors(query_embeddings, k=k, sources=source_filter)
+
+        for i, documents in zip(missing, search_results):
+            results[i] = self._build_context(documents)
+            self.query_cache.set((queries[i], source_key, k), results[i])
+        return results
+
+    def _build_context(self, search_results: List[Document]) -> Tuple[str, List[Source]]:
+        """Assemble le contexte et la liste des sources à partir des documents trouvés."""
+        context_parts = []
         sources = []
         
         for result in search_results:
             if hasattr(result, 'metadata') and result.metadata:
                 source_name = result.metadata.get('source', 'Unknown source')
-                # Si des sources sont sélectionnées, filtrer les résultats
-                if selected_sources and not any(src in source_name for src in selected_sources):
-                    continue
-                
                 page_num = result.metadata.get('page', 'Unknown page')
-                context += result.page_content + "\n"
+                context_parts.append(result.page_content)
                 sources.append(Source(
                     name=os.path.basename(source_name) if source_name != 'Unknown source' else source_name,
                     page=page_num
                 ))
         
-        return context, sources
+        return "\n".join(context_parts), sources
 
     def generate_prompt(self, query: str, context: str, sources: List[Source]) -> str:
-        """Generate the RAG prompt with the given context and sources."""
+        """Generate the RAG user message; the fixed instructions live in SYSTEM_INSTRUCTION."""
         escaped = context.replace("\n", "\\n")
         sources_text = "\n".join(
             f"Source {i}: {source.name}, Page: {source.page}"
             for i, source in enumerate(sources, 1)
         )
         
-        return f"""
-        Vous êtes un assistant utile et informatif qui répond aux questions en utilisant le texte du contexte de référence inclus ci-dessous.\
-        Assurez-vous de répondre par une phrase complète, en étant exhaustif et en incluant toutes les informations pertinentes.\
-        Cependant, vous parlez à un public non technique, alors assurez-vous d'expliquer les concepts complexes de façon simple.\
-        Si le contexte n'est pas pertinent pour la réponse, vous pouvez l'ignorer.
-        
-        TRÈS IMPORTANT: À la fin de votre réponse, citez les sources exactes que vous avez utilisées en indiquant 
-        le nom du document et le numéro de page où l'information a été trouvée, en utilisant le format suivant:
-        [Source: nom_du_document, Page: numéro_de_page]
-        
-        Voici les sources disponibles:
-        {sources_text}
-        
-        QUESTION: '{query}'
-        CONTEXTE: '{escaped}'
-             
-        RÉPONSE:
-        """
+        return f"QUESTION: '{query}'\nCONTEXTE: '{escaped}'\nSOURCES:\n{sources_text}"
 
     def generate_answer(self, prompt: str) -> str:
         """Generate an answer using the Gemini model."""
         response = self.model.generate_content(prompt)
         return response.text
 
+    def generate_answer_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Generate an answer using the Gemini model, yielding text as it arrives.
+
+        Chunks without parts (safety block, final chunk carrying only the
+        finish reason) are skipped.
+
+        Raises:
+            ValueError: If the model produced no text at all
+        """
+        produced = False
+        last_chunk = None
+        for chunk in self.model.generate_content(prompt, stream=True):
+            last_chunk = chunk
+            if chunk.parts:
+                produced = True
+                yield chunk.text
+
+        if not produced:
+            reason = "unknown"
+            if last_chunk is not None:
+                if last_chunk.candidates:
+                    reason = last_chunk.candidates[0].finish_reason.name
+                elif last_chunk.prompt_feedback.block_reason:
+                    reason = last_chunk.prompt_feedback.block_reason.name
+            raise ValueError(f"No answer generated (finish reason: {reason})")
+
     def query(self, user_query: str) -> str:
         """Process a user query and return the generated answer."""
         context, sources = self.get_relevant_context(user_query)
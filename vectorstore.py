@@ -0,0 +1,191 @@
+"""
+Module de stockage et de recherche des vecteurs.
+Index FAISS exacts (produit scalaire), un par source, accompagnés des textes et métadonnées.
+"""
+
+import heapq
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Union
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from config import VECTOR_PRECISION, EMBEDDING_BACKEND
+
+INDEX_FILE = "index_{}.faiss"   # Index FAISS sérialisé (un par source)
+PAYLOADS_FILE = "payloads.pkl"  # Textes et métadonnées associés aux vecteurs
+READY_FILE = "_INDEX_READY"     # Sentinelle écrite une fois l'index complet
+
+# Quantificateurs FAISS selon la précision de stockage des vecteurs
+QUANTIZERS = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+def _create_index(dimension: int, precision: str) -> faiss.Index:
+    """Crée un index exhaustif (produit scalaire) à la précision demandée."""
+    if precision == "fp32":
+        return faiss.IndexFlatIP(dimension)
+    if precision not in QUANTIZERS:
+        raise ValueError(f"Unknown vector precision: {precision}")
+    return faiss.IndexScalarQuantizer(dimension, QUANTIZERS[precision], faiss.METRIC_INNER_PRODUCT)
+
+def _index_settings(model_name: str, precision: str, backend: str) -> dict:
+    """Paramètres qui déterminent le contenu de l'index."""
+    return {"model": model_name, "precision": precision, "backend": backend}
+
+def index_is_ready(directory: str, model_name: str, precision: str = VECTOR_PRECISION,
+                   backend: str = EMBEDDING_BACKEND) -> bool:
+    """
+    Vérifie qu'un index complet, construit avec la configuration donnée, existe.
+
+    Args:
+        directory: Répertoire de l'index
+        model_name: Modèle d'embedding attendu
+        precision: Précision de stockage des vecteurs attendue
+        backend: Moteur d'inférence de l'encodeur attendu
+
+    Returns:
+        True si la sentinelle existe et correspond à la configuration, False sinon
+    """
+    try:
+        with open(os.path.join(directory, READY_FILE), encoding="utf-8") as f:
+            ready = json.load(f)
+    except (OSError, ValueError):
+        return False
+    expected = _index_settings(model_name, precision, backend)
+    return all(ready.get(key) == value for key, value in expected.items())
+
+def mark_index_ready(directory: str, model_name: str, chunks: int, precision: str = VECTOR_PRECISION,
+                     backend: str = EMBEDDING_BACKEND) -> None:
+    """Écrit la sentinelle de manière atomique (fichier temporaire puis renommage)."""
+    tmp_path = os.path.join(directory, READY_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({**_index_settings(model_name, precision, backend), "chunks": chunks}, f)
+    os.replace(tmp_path, os.path.join(directory, READY_FILE))
+
+def clear_index_ready(directory: str) -> None:
+    """Supprime la sentinelle avant une reconstruction de l'index."""
+    try:
+        os.remove(os.path.join(directory, READY_FILE))
+    except FileNotFoundError:
+        pass
+
+class FaissVectorStore:
+    """
+    Base vectorielle FAISS à recherche exhaustive, partitionnée par source.
+
+    Pour quelques milliers de segments, un parcours complet (IndexFlatIP)
+    est exact et plus rapide qu'un graphe HNSW. Les vecteurs étant normalisés,
+    le produit scalaire correspond à la similarité cosinus. Chaque livre a son
+    propre index : filtrer par source revient à ne parcourir que les index choisis.
+    Les vecteurs peuvent être stockés en FP16 ou INT8 pour réduire la mémoire
+    parcourue à chaque recherche.
+
+    Attributs:
+        indexes: Index FAISS par nom de source
+        payloads: Listes (texte, métadonnées) par source, alignées sur les identifiants de l'index
+    """
+
+    def __init__(self, indexes: Dict[str, faiss.Index], payloads: Dict[str, List[tuple]]):
+        self.indexes = indexes
+        self.payloads = payloads
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Union[np.ndarray, List[List[float]]], docs: List[Document],
+                        precision: str = VECTOR_PRECISION) -> "FaissVectorStore":
+        """
+        Construit les index à partir de vecteurs déjà calculés.
+
+        Args:
+            embeddings: Vecteurs normalisés, un par document (tableau float32 utilisé sans copie)
+            docs: Documents correspondants (regroupés selon metadata['source'])
+            precision: Précision de stockage des vecteurs (fp32, fp16 ou int8)
+
+        Returns:
+            Instance de la base vectorielle
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        positions: Dict[str, List[int]] = {}
+        for i, doc in enumerate(docs):
+            positions.setdefault(doc.metadata.get('source', 'Unknown source'), []).append(i)
+
+        indexes, payloads = {}, {}
+        for source, rows in positions.items():
+            index = _create_index(vectors.shape[1], precision)
+            if not index.is_trained:
+                index.train(vectors[rows])
+            index.add(vectors[rows])
+            indexes[source] = index
+            payloads[source] = [(docs[i].page_content, docs[i].metadata) for i in rows]
+        return cls(indexes, payloads)
+
+    @classmethod
+    def load(cls, directory: str) -> "FaissVectorStore":
+        """Charge les index et les métadonnées depuis le répertoire donné."""
+        with open(os.path.join(directory, PAYLOADS_FILE), "rb") as f:
+            payloads = pickle.load(f)
+        indexes = {
+            source: faiss.read_index(os.path.join(directory, INDEX_FILE.format(i)))
+            for i, source in enumerate(payloads)
+        }
+        return cls(indexes, payloads)
+
+    def save(self, directory: str) -> None:
+        """Persiste les index et les métadonnées dans le répertoire donné."""
+        os.makedirs(directory, exist_ok=True)
+        for i, source in enumerate(self.payloads):
+            faiss.write_index(self.indexes[source], os.path.join(directory, INDEX_FILE.format(i)))
+        with open(os.path.join(directory, PAYLOADS_FILE), "wb") as f:
+            pickle.dump(self.payloads, f)
+
+    def count(self) -> int:
+        """Nombre de vecteurs indexés."""
+        return sum(index.ntotal for index in self.indexes.values())
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    sources: Optional[List[str]] = None) -> List[Document]:
+        """
+        Recherche les documents les plus proches du vecteur donné.
+
+        Args:
+            embedding: Vecteur de la requête
+            k: Nombre de résultats à retourner
+            sources: Sources à parcourir (toutes si None)
+
+        Returns:
+            Documents triés par similarité décroissante
+        """
+        return self.similarity_search_by_vectors([embedding], k=k, sources=sources)[0]
+
+    def similarity_search_by_vectors(self, embeddings: Union[np.ndarray, List[List[float]]], k: int = 4,
+                                     sources: Optional[List[str]] = None) -> List[List[Document]]:
+        """
+        Recherche en un seul appel les documents les plus proches de plusieurs vecteurs.
+
+        Args:
+            embeddings: Vecteurs des requêtes
+            k: Nombre de résultats à retourner par requête
+            sources: Sources à parcourir (toutes si None)
+
+        Returns:
+            Pour chaque requête, documents triés par similarité décroissante
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        candidates = [[] for _ in range(len(queries))]
+        for source in (self.indexes if sources is None else sources):
+            if source not in self.indexes:
+                continue
+            scores, indices = self.indexes[source].search(queries, k)
+            for row, (row_scores, row_indices) in enumerate(zip(scores, indices)):
+                candidates[row].extend(
+                    (score, source, i) for score, i in zip(row_scores, row_indices) if i != -1
+                )
+        return [
+            [
+                Document(page_content=self.payloads[source][i][0], metadata=self.payloads[source][i][1])
+                for _, source, i in heapq.nlargest(k, row_candidates, key=lambda c: c[0])
+            ]
+            for row_candidates in candidates
+        ]